@@ -25,6 +25,20 @@ else:
     raise Exception("Ariadna's dll was not found: %s" % str(dll_paths))
 
 
+class _RevcompTable(dict):
+    ''' Translation table that drops unknown symbols.
+    '''
+    def __missing__(self, key):
+        return None
+
+# tables are built from ordinals and bytearrays to work with both python 2 and 3
+_REVCOMP_FROM = 'ATCGNatcgn~[]'
+_REVCOMP_TO = 'TAGCNtagcn~]['
+_REVCOMP_STR = _RevcompTable((ord(a), ord(b)) for a, b in zip(_REVCOMP_FROM, _REVCOMP_TO))
+_REVCOMP_BYTES = bytes(bytearray(_REVCOMP_STR.get(x, x) for x in range(256)))
+_REVCOMP_BYTES_DELETE = bytes(bytearray(x for x in range(256) if chr(x) not in _REVCOMP_FROM))
+
+
 def get_revcomp(sequence):
     '''Return reverse complementary sequence.
 
@@ -32,16 +46,26 @@ def get_revcomp(sequence):
     'CGAT'
 
     '''
-    c = dict(zip('ATCGNatcgn~[]', 'TAGCNtagcn~]['))
-    return ''.join(c.get(nucleotide, '') for nucleotide in reversed(sequence))
+    if isinstance(sequence, bytes):
+        return sequence.translate(_REVCOMP_BYTES, _REVCOMP_BYTES_DELETE)[::-1]
+    return sequence.translate(_REVCOMP_STR)[::-1]
 
 
 def hamming_distance(s1, s2):
     """ Get Hamming distance: the number of corresponding symbols that differs in given strings.
+    Strings could be str or bytes, positions with N are skipped.
     """
-    return sum(i != j for (i,j) in zip(s1, s2) if i != 'N' and j != 'N')
+    if not isinstance(s1, bytes):
+        s1 = s1.encode("utf-8")
+    if not isinstance(s2, bytes):
+        s2 = s2.encode("utf-8")
+    if s1 == s2:
+        return 0
+    return lib.AindexWrapper_hamming_distance(s1, s2, min(len(s1), len(s2)))
 
 
+lib.AindexWrapper_hamming_distance.argtypes = [c_char_p, c_char_p, c_size_t]
+lib.AindexWrapper_hamming_distance.restype = c_size_t
 
 lib.AindexWrapper_new.argtypes = []
 lib.AindexWrapper_new.restype = c_void_p
@@ -52,6 +76,15 @@ lib.AindexWrapper_load.restype = None
 lib.AindexWrapper_get.argtypes = [c_void_p, c_char_p]
 lib.AindexWrapper_get.restype = c_size_t
 
+lib.AindexWrapper_get_tf_by_code.argtypes = [c_void_p, c_uint64]
+lib.AindexWrapper_get_tf_by_code.restype = c_size_t
+
+lib.AindexWrapper_get_tf_values.argtypes = [c_void_p, c_char_p, c_size_t, c_void_p]
+lib.AindexWrapper_get_tf_values.restype = None
+
+lib.AindexWrapper_get_tf_values_for_sequence.argtypes = [c_void_p, c_char_p, c_size_t, c_void_p]
+lib.AindexWrapper_get_tf_values_for_sequence.restype = c_size_t
+
 lib.AindexWrapper_get_kid_by_kmer.argtypes = [c_void_p, c_char_p]
 lib.AindexWrapper_get_kid_by_kmer.restype = c_size_t
 
@@ -73,11 +106,14 @@ lib.AindexWrapper_get_hash_size.restype = c_size_t
 lib.AindexWrapper_get_rid.argtypes = [c_void_p]
 lib.AindexWrapper_get_rid.restype = c_size_t
 
+lib.AindexWrapper_get_rids.argtypes = [c_void_p, c_void_p, c_void_p, c_size_t]
+lib.AindexWrapper_get_rids.restype = None
+
 lib.AindexWrapper_get_kmer.argtypes = [c_void_p, c_size_t, c_char_p, c_char_p]
 lib.AindexWrapper_get_kmer.restype = c_size_t
 
 lib.AindexWrapper_get_positions.argtypes = [c_void_p, c_void_p, c_char_p]
-lib.AindexWrapper_get_positions.restype = None
+lib.AindexWrapper_get_positions.restype = c_size_t
 
 lib.AindexWrapper_set_positions.argtypes = [c_void_p, c_void_p, c_char_p]
 lib.AindexWrapper_set_positions.restype = None
@@ -105,6 +141,40 @@ class AIndex(object):
         '''
         return lib.AindexWrapper_get(self.obj, kmer.encode('utf-8'))
 
+    def get_tf_by_code(self, code):
+        ''' Return tf for 2-bit encoded kmer (A=0, C=1, G=2, T=3, first nucleotide in high bits).
+        '''
+        return lib.AindexWrapper_get_tf_by_code(self.obj, code)
+
+    def get_tf_values(self, kmers, k=23):
+        ''' Return list of tf for given kmers with one call to aindex.
+        Only k=23 is supported by aindex.
+        '''
+        if k != 23:
+            raise Exception("Only 23-mers are supported, got k=%s" % k)
+        data = [kmer.encode('utf-8') for kmer in kmers]
+        for kmer in data:
+            if len(kmer) != k:
+                raise Exception("Kmer should have length %s: %s" % (k, kmer))
+        n = len(data)
+        r = (ctypes.c_size_t*n)()
+        lib.AindexWrapper_get_tf_values(self.obj, b"".join(data), c_size_t(n), pointer(r))
+        return r[:]
+
+    def get_tf_values_for_sequence(self, sequence, k=23):
+        ''' Return list of tf for every kmer of given sequence.
+        Only k=23 is supported by aindex.
+        '''
+        if k != 23:
+            raise Exception("Only 23-mers are supported, got k=%s" % k)
+        data = sequence.encode('utf-8')
+        n = len(data) - k + 1
+        if n <= 0:
+            return []
+        r = (ctypes.c_size_t*n)()
+        m = lib.AindexWrapper_get_tf_values_for_sequence(self.obj, data, c_size_t(len(data)), pointer(r))
+        return r[:m]
+
     def get_kid_by_kmer(self, kmer):
         ''' Return kmer id for kmer
         '''
@@ -132,9 +202,9 @@ class AIndex(object):
             raise Exception("Reads files was not found: %s" % str(reads_file))
 
         print("Loadind reads with mmap: %s" % reads_file)
-        with open(reads_file, "r+b") as f:
-            self.reads = mmap.mmap(f.fileno(), 0)
-            self.reads_size = self.reads.size()
+        with open(reads_file, "rb") as f:
+            self.reads = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.reads_size = len(self.reads)
         lib.AindexWrapper_load_reads(self.obj, reads_file.encode('utf-8'))
         print("\tloaded %s chars." % self.reads_size)
 
@@ -152,16 +222,13 @@ class AIndex(object):
         and yield (start_pos, next_read_pos, read).
         '''
         start = 0
-        end = 0
         N = len(self.reads)
 
         while True:
-            while end < N and not self.end_cheker(end):
-                end += 1
+            end = self.get_read_end(start)
             yield start, end+1, self.reads[start:end]
             start = end+1
-            end = end+1
-            if end >= N:
+            if start >= N:
                 break
 
     def iter_reads_se(self):
@@ -169,22 +236,28 @@ class AIndex(object):
         and yield (start_pos, next_read_pos, 0|1|..., read).
         '''
         start = 0
-        end = 0
         N = len(self.reads)
         rid = 0
 
         while True:
-            while not self.end_cheker(end):
-                end += 1
+            end = self.get_read_end(start)
             splited_reads = self.reads[start:end].split("~".encode("utf-8"))
             for i, subread in enumerate(splited_reads):
                 yield rid, start, i, subread
             rid += 1
             start = end+1
-            end = end+1
-            if end >= N:
+            if start >= N:
                 break
 
+    def get_read_end(self, pos):
+        ''' Get position of the newline ending the read
+        that contains given position in read file.
+        '''
+        end = self.reads.find(b"\n", pos)
+        if end == -1:
+            return self.reads_size
+        return end
+
     def get_hash_size(self):
         ''' Get hash size.
         ''' 
@@ -196,12 +269,19 @@ class AIndex(object):
         '''
         return c_size_t(lib.AindexWrapper_get_rid(self.obj, c_size_t(pos))).value
 
+    def get_rids(self, poses):
+        ''' Get read ids for list of positions in read file with one call to aindex.
+        '''
+        n = len(poses)
+        p = (ctypes.c_size_t*n)(*poses)
+        r = (ctypes.c_size_t*n)()
+        lib.AindexWrapper_get_rids(self.obj, pointer(p), pointer(r), c_size_t(n))
+        return r[:]
+
     def get_kmer_by_kid(self, kid, k=23):
         ''' Return kmer by kmer id 
         '''
-        s = "N"*k
-        kmer = ctypes.c_char_p()
-        kmer.value = s.encode("utf-8")
+        kmer = ctypes.create_string_buffer(k+1)
         lib.AindexWrapper_get_kmer_by_kid(self.obj, c_size_t(kid), kmer)
         return kmer.value
 
@@ -210,15 +290,8 @@ class AIndex(object):
         ''' Get kmer, revcomp kmer and corresondent tf 
         for given position in read file.
         '''
-
-        s = "N"*k
-
-        kmer = ctypes.c_char_p()
-        kmer.value = s.encode("utf-8")
-
-        rkmer = ctypes.c_char_p()
-        rkmer.value = s.encode("utf-8")
-
+        kmer = ctypes.create_string_buffer(k+1)
+        rkmer = ctypes.create_string_buffer(k+1)
         tf = lib.AindexWrapper_get_kmer(self.obj, pos, kmer, rkmer)
         return kmer.value, rkmer.value, tf
 
@@ -231,23 +304,13 @@ class AIndex(object):
 
         n = self.max_tf
 
+        # buffer is allocated per call to stay thread-safe, C++ side returns the number of filled positions
         r = (ctypes.c_size_t*n)()
 
-        array_type = ctypes.c_size_t * n
-
         kmer = str(kmer)
 
-        lib.AindexWrapper_get_positions(self.obj, pointer(r), kmer.encode('utf-8'))
-        
-        poses = []
-        ids = []
-        poses_array = []
-        for i in range(n):
-            if r[i] > 0:
-                poses_array.append(r[i]-1)
-            else:
-                break
-        return poses_array
+        m = lib.AindexWrapper_get_positions(self.obj, pointer(r), kmer.encode('utf-8'))
+        return [x-1 for x in r[:m]]
 
 
     def set(self, poses_array, kmer, batch_size):
@@ -302,12 +365,12 @@ def get_rid2poses(kmer, kmer2tf):
     ''' Wrapper that handle case when two kmer hits in one read.
     Return rid->poses_in_read dictionary for given kmer. 
     In this case rid is the start position in reads file.
+    Positions are visited in ascending order to walk reads file sequentially.
     '''
-    poses = kmer2tf.pos(kmer)
+    poses = sorted(kmer2tf.pos(kmer))
     hits = defaultdict(list)
-    for pos in poses:
-        start = kmer2tf.get_rid(pos)
-        hits[start].append(c_size_t(pos).value - start)
+    for pos, start in zip(poses, kmer2tf.get_rids(poses)):
+        hits[start].append(pos - start)
     return hits
 
 
@@ -330,11 +393,7 @@ def iter_reads_by_kmer(kmer, kmer2tf, used_reads=None, only_left=False, skip_mul
             if len(poses) > 1:
                 continue
 
-        end = rid
-        while True:
-            if kmer2tf.end_cheker(end):
-                break
-            end += 1
+        end = kmer2tf.get_read_end(rid)
         read = kmer2tf.reads[rid:end]
 
         pos = poses[0]
@@ -390,11 +449,13 @@ def iter_reads_by_sequence_and_hamming(sequence, hd, kmer2tf, used_reads=None, o
     if len(sequence) >= k:
         kmer = sequence[:k]
         n = len(sequence)
+        # reads are bytes slices of the mmap
+        sequence = sequence.encode("utf-8")
         for data in iter_reads_by_kmer(kmer, kmer2tf, used_reads=used_reads, only_left=only_left, skip_multiple=skip_multiple, k=k):
             all_poses = data[-1]
             read = data[2]
             for pos in all_poses:
-                if len(read[pos:]) == n:
+                if len(read) - pos == n:
                     if hamming_distance(read[pos:], sequence) <= hd:
                         yield data            
     else:
@@ -416,31 +477,32 @@ def get_reads_se_by_kmer(kmer, kmer2tf, used_reads, k=23):
 
     result = []
     hits = get_rid2poses(kmer, kmer2tf)
-    rkmer = get_revcomp(kmer)
+    bkmer = kmer.encode("utf-8")
+    spring = "~".encode("utf-8")
 
     for hit in hits:
-        end = hit
-        while True:
-            if kmer2tf.end_cheker(end):
-                break
-            end += 1
+        end = kmer2tf.get_read_end(hit)
         poses = hits[hit]
         read = kmer2tf.reads[hit:end]
         was_reversed = 0
 
+        # both subreads of the spring were used, skip before revcomp and splitting
+        if (hit,0) in used_reads and (hit,1) in used_reads and spring in read:
+            continue
+
         pos = poses[0]
-        if read[pos:pos+k] != kmer.encode("utf-8"):
+        if read[pos:pos+k] != bkmer:
             read = get_revcomp(read)
             poses = [len(read) - x - k for x in poses]
             pos = poses[0]
             was_reversed = 1
-            if read[pos:pos+k] != kmer.encode("utf-8"):
+            if read[pos:pos+k] != bkmer:
                 print("Critical error kmer and ref are not equal:")
                 print(read[pos:pos+k])
                 print(kmer)
                 continue
                 
-        spring_pos = read.find("~".encode("utf-8"))
+        spring_pos = read.find(spring)
 
         if spring_pos == -1:
             result.append([hit, end+1, read, pos, -1, was_reversed, poses])
@@ -471,12 +533,12 @@ def get_left_right_distances(left_kmer, right_kmer, kmer2tf):
     TODO: implement it more efficently.
     '''
     hits = defaultdict(list)
-    for pos in kmer2tf.pos(left_kmer):
-        start = kmer2tf.get_rid(pos)
+    poses = kmer2tf.pos(left_kmer)
+    for pos, start in zip(poses, kmer2tf.get_rids(poses)):
         hits[start].append((0,pos-start))
 
-    for pos in kmer2tf.pos(right_kmer):
-        start = kmer2tf.get_rid(pos)
+    poses = kmer2tf.pos(right_kmer)
+    for pos, start in zip(poses, kmer2tf.get_rids(poses)):
         hits[start].append((1,pos-start))
 
     results = []
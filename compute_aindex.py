@@ -10,8 +10,9 @@ from PyExp import runner
 import os, sys
 
 
-if __name__ == '__main__':
-
+def _build_parser():
+    ''' Build command line parser.
+    '''
     parser = argparse.ArgumentParser(description='Compute index.')
     parser.add_argument('-i', help='Fasta, comma separated fastqs or reads', required=True)
     parser.add_argument('-j', help='JF2 file if exists (None)', required=False, default=None)
@@ -22,8 +23,17 @@ if __name__ == '__main__':
     parser.add_argument('--interactive', help='Interactive (False)', required=False, default=None)
     parser.add_argument('-P', help='Threads (12)', required=False, default=12)
     parser.add_argument('-M', help='JF2 memory in Gb (5)', required=False, default=5)
+    return parser
+
+
+PARSER = _build_parser()
 
-    args = vars(parser.parse_args())
+
+def main(argv=None):
+    ''' Compute index and aindex for given reads.
+    argv defaults to sys.argv[1:].
+    '''
+    args = vars(PARSER.parse_args(argv))
 
     ### Checking installed tools:
     ####### 1) jellyfish
@@ -41,7 +51,7 @@ if __name__ == '__main__':
 
     if not reads_type in ["reads","fastq","fasta"]:
         print("Reads type not reds or fastq or fasta")
-        sys.exit(1)
+        return 1
 
     threads = args["P"]
     jf2_file = args["j"]
@@ -123,5 +133,7 @@ if __name__ == '__main__':
             "sort -k2nr %s.23.dat > %s.23.sdat" % (prefix, prefix),
         ]
         runner.run(commands)
-        
 
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,6 +5,7 @@
 #@author: Aleksey Komissarov
 #@contact: ad3002@gmail.com
 
+import sys
 from aindex import *
 
 settings = {
@@ -23,9 +24,11 @@ right_kmer = "AGTTAATACTTTTAACAATATTA"
 
 print("Task 1. Get kmer frequency")
 # raw_input("\nReady?")
-for i in range(len(sequence)-k+1):
+lines = []
+for i, tf in enumerate(index.get_tf_values_for_sequence(sequence, k=k)):
     kmer = sequence[i:i+k]
-    print("Position %s kmer %s freq = %s" % (i, kmer, index[kmer]))
+    lines.append("Position %s kmer %s freq = %s" % (i, kmer, tf))
+sys.stdout.write("\n".join(lines) + "\n")
 
 print("Task 2. Iter read by read, print the first 20 reads")
 # raw_input("\nReady?")
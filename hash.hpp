@@ -143,10 +143,9 @@ struct PHASH_MAP {
 
     inline size_t get_pfid(std::string &_kmer) {
         uint64_t kmer = get_dna23_bitset(_kmer);
-        std::string _rev_kmer = "NNNNNNNNNNNNNNNNNNNNNNN";
         uint64_t rev_kmer = reverseDNA(kmer);
-        get_bitset_dna23(rev_kmer, _rev_kmer);
-        if (_kmer.compare(_rev_kmer) <= 0) {
+        // 2-bit codes keep lexicographic order, so the canonical kmer has the smaller code
+        if (kmer <= rev_kmer) {
             size_t h1 = hasher.lookup(_kmer, str_adapter);
             if (h1 < n && checker[h1] == kmer) {
                 return h1;
@@ -154,6 +153,8 @@ struct PHASH_MAP {
                 return n;
             }
         } else {
+            std::string _rev_kmer = "NNNNNNNNNNNNNNNNNNNNNNN";
+            get_bitset_dna23(rev_kmer, _rev_kmer);
             size_t h1 = hasher.lookup(_rev_kmer, str_adapter);
             if (h1 < n && checker[h1] == rev_kmer) {
                 return h1;
@@ -165,13 +166,10 @@ struct PHASH_MAP {
 
     inline size_t get_pfid_by_umer_safe(uint64_t kmer) {
 
-        std::string _kmer = "NNNNNNNNNNNNNNNNNNNNNNN";
-        get_bitset_dna23(kmer, _kmer, Settings::K);
-
-        std::string _rev_kmer = "NNNNNNNNNNNNNNNNNNNNNNN";
         uint64_t rev_kmer = reverseDNA(kmer);
-        get_bitset_dna23(rev_kmer, _rev_kmer);
-        if (_kmer.compare(_rev_kmer) <= 0) {
+        if (kmer <= rev_kmer) {
+            std::string _kmer = "NNNNNNNNNNNNNNNNNNNNNNN";
+            get_bitset_dna23(kmer, _kmer, Settings::K);
             size_t h1 = hasher.lookup(_kmer, str_adapter);
             if (h1 < n && checker[h1] == kmer) {
                 return h1;
@@ -179,6 +177,8 @@ struct PHASH_MAP {
                 return n;
             }
         } else {
+            std::string _rev_kmer = "NNNNNNNNNNNNNNNNNNNNNNN";
+            get_bitset_dna23(rev_kmer, _rev_kmer);
             size_t h1 = hasher.lookup(_rev_kmer, str_adapter);
             if (h1 < n && checker[h1] == rev_kmer) {
                 return h1;
@@ -5,21 +5,29 @@
 #include <string>
 #include <limits.h>
 #include <iostream>
+#include <cstring>
 #include "settings.hpp"
+#include "kmers.hpp"
 
 /// CONVERTERS to uint 23-mers and 13-mers from strings and char*
 
+NucleotideCodes::NucleotideCodes() {
+    std::memset(code, BASE_INVALID, sizeof(code));
+    code['A'] = BASE_A;
+    code['C'] = BASE_C;
+    code['G'] = BASE_G;
+    code['T'] = BASE_T;
+}
+
+const NucleotideCodes nucleotide_codes;
+
 uint64_t get_dna23_bitset(std::string dna_str) {
     /*
      * Convert 23-mer to bit 23-mer.
      */
     uint64_t num = 0;
     for (int8_t n=0; n<Settings::K; n++) {
-        num = num << 2;
-        if (dna_str[n] == 'A') num += 0;
-        if (dna_str[n] == 'C') num += 1;
-        if (dna_str[n] == 'G') num += 2;
-        if (dna_str[n] == 'T') num += 3;
+        num = (num << 2) | (nucleotide_codes.code[(uint8_t)dna_str[n]] & BASE_MASK);
     }
     return num;
 }
@@ -30,11 +38,7 @@ uint32_t get_dna13_bitset(std::string dna_str) {
      */
     uint32_t num = 0;
     for (int8_t n=0; n<13; n++) {
-        num = num << 2;
-        if (dna_str[n] == 'A') num += 0;
-        if (dna_str[n] == 'C') num += 1;
-        if (dna_str[n] == 'G') num += 2;
-        if (dna_str[n] == 'T') num += 3;
+        num = (num << 2) | (nucleotide_codes.code[(uint8_t)dna_str[n]] & BASE_MASK);
     }
     return num;
 }
@@ -45,11 +49,7 @@ uint64_t get_dna23_bitset(char* dna_str) {
      */
     uint64_t num = 0;
     for (int8_t n=0; n<Settings::K; n++) {
-        num = num << 2;
-        if (dna_str[n] == 'A') num += 0;
-        if (dna_str[n] == 'C') num += 1;
-        if (dna_str[n] == 'G') num += 2;
-        if (dna_str[n] == 'T') num += 3;
+        num = (num << 2) | (nucleotide_codes.code[(uint8_t)dna_str[n]] & BASE_MASK);
     }
     return num;
 }
@@ -60,40 +60,21 @@ uint32_t get_dna13_bitset(char* dna_str) {
      */
     uint32_t num = 0;
     for (int8_t n=0; n<13; n++) {
-        num = num << 2;
-        if (dna_str[n] == 'A') num += 0;
-        if (dna_str[n] == 'C') num += 1;
-        if (dna_str[n] == 'G') num += 2;
-        if (dna_str[n] == 'T') num += 3;
+        num = (num << 2) | (nucleotide_codes.code[(uint8_t)dna_str[n]] & BASE_MASK);
     }
     return num;
 }
 
 /// CONVERTERS from uint to string kmers
 
+static const char nucleotide_symbols[] = "ACGT";
+
 void get_bitset_dna23(uint64_t x, std::string &res, int k) {
     /*
      * Convert bit 23-mer to string.
      */
     for (int8_t i = k-1; i+1; i--) {
-        switch(x & 3) {
-            case 0:
-                res[i] = 'A';
-                break;
-
-            case 1:
-                res[i] = 'C';
-                break;
-
-            case 2:
-                res[i] = 'G';
-                break;
-
-            case 3:
-                res[i] = 'T';
-                break;
-        }
-
+        res[i] = nucleotide_symbols[x & 3];
         x >>= 2;
     }
 }
@@ -103,24 +84,7 @@ void get_bitset_dna23_c(uint64_t x, char *res, int k) {
      * Convert bit 23-mer to string.
      */
     for (int8_t i = k-1; i+1; i--) {
-        switch(x & 3) {
-            case 0:
-                res[i] = 'A';
-                break;
-
-            case 1:
-                res[i] = 'C';
-                break;
-
-            case 2:
-                res[i] = 'G';
-                break;
-
-            case 3:
-                res[i] = 'T';
-                break;
-        }
-
+        res[i] = nucleotide_symbols[x & 3];
         x >>= 2;
     }
 }
@@ -131,24 +95,7 @@ std::string get_bitset_dna23(uint64_t x) {
      */
     std::string res = "NNNNNNNNNNNNNNNNNNNNNNN";
     for (int8_t i = 22; i+1; i--) {
-        switch(x & 3) {
-            case 0:
-                res[i] = 'A';
-                break;
-
-            case 1:
-                res[i] = 'C';
-                break;
-
-            case 2:
-                res[i] = 'G';
-                break;
-
-            case 3:
-                res[i] = 'T';
-                break;
-        }
-
+        res[i] = nucleotide_symbols[x & 3];
         x >>= 2;
     }
 
@@ -161,24 +108,7 @@ void get_bitset_dna13(uint32_t x, std::string &res, int k) {
      * Convert bit 13-mer to string.
      */
     for (int8_t i = k-1; i+1; i--) {
-        switch(x & 3) {
-            case 0:
-                res[i] = 'A';
-                break;
-
-            case 1:
-                res[i] = 'C';
-                break;
-
-            case 2:
-                res[i] = 'G';
-                break;
-
-            case 3:
-                res[i] = 'T';
-                break;
-        }
-
+        res[i] = nucleotide_symbols[x & 3];
         x >>= 2;
     }
 }
@@ -188,24 +118,7 @@ void get_bitset_dna13_c(uint32_t x, char *res, int k) {
      * Convert bit 13-mer to string.
      */
     for (int8_t i = k-1; i+1; i--) {
-        switch(x & 3) {
-            case 0:
-                res[i] = 'A';
-                break;
-
-            case 1:
-                res[i] = 'C';
-                break;
-
-            case 2:
-                res[i] = 'G';
-                break;
-
-            case 3:
-                res[i] = 'T';
-                break;
-        }
-
+        res[i] = nucleotide_symbols[x & 3];
         x >>= 2;
     }
 }
@@ -216,24 +129,7 @@ std::string get_bitset_dna13(uint32_t x) {
      */
     std::string res = "NNNNNNNNNNNNN";
     for (int8_t i = 12; i+1; i--) {
-        switch(x & 3) {
-            case 0:
-                res[i] = 'A';
-                break;
-
-            case 1:
-                res[i] = 'C';
-                break;
-
-            case 2:
-                res[i] = 'G';
-                break;
-
-            case 3:
-                res[i] = 'T';
-                break;
-        }
-
+        res[i] = nucleotide_symbols[x & 3];
         x >>= 2;
     }
 
@@ -270,25 +166,32 @@ std::string get_bitset_dna13(uint32_t x) {
 //}
 
 
+struct ComplementTable {
+    /*
+     * ASCII complement for nucleotides, other symbols except spring are coded as N.
+     */
+    char symbol[256];
+
+    ComplementTable(char spring) {
+        std::memset(symbol, 'N', sizeof(symbol));
+        symbol['A'] = 'T';
+        symbol['C'] = 'G';
+        symbol['G'] = 'C';
+        symbol['T'] = 'A';
+        symbol['~'] = spring;
+    }
+};
+
+static const ComplementTable complement_with_spring('~');
+static const ComplementTable complement('N');
+
 void get_revcomp(std::string &input, std::string &output) {
     /*
      * Revcomp for string.
      */
     size_t n = input.length();
-    for(int y = n-1; y >= 0; y--) {
-        if (input[y] == 'A') {
-            output[n-1-y] = 'T';
-        } else if (input[y] == 'C') {
-            output[n-1-y] = 'G';
-        } else if (input[y] == 'G') {
-            output[n-1-y] = 'C';
-        } else if (input[y] == 'T') {
-            output[n-1-y] = 'A';
-        } else if (input[y] == '~') {
-            output[n-1-y] = '~';
-        } else {
-            output[n-1-y] = 'N';
-        }
+    for (size_t y = 0; y < n; y++) {
+        output[n-1-y] = complement_with_spring.symbol[(uint8_t)input[y]];
     }
 }
 
@@ -298,40 +201,31 @@ std::string get_revcomp(std::string &input) {
      */
     size_t n = input.length();
     std::string output(n, 'N');
-    for(int y = n-1; y >= 0; y--) {
-        if (input[y] == 'A') {
-            output[n-1-y] = 'T';
-        } else if (input[y] == 'C') {
-            output[n-1-y] = 'G';
-        } else if (input[y] == 'G') {
-            output[n-1-y] = 'C';
-        } else if (input[y] == 'T') {
-            output[n-1-y] = 'A';
-        } else {
-            output[n-1-y] = 'N';
-        }
+    for (size_t y = 0; y < n; y++) {
+        output[n-1-y] = complement.symbol[(uint8_t)input[y]];
     }
     return output;
 }
 
 uint64_t _reversePairs(uint64_t num) {
     /*
-     * Reverse bit 23-mer helper.
+     * Reverse bit 23-mer helper: swap 2-bit pairs, nibbles, bytes, words and halves.
      */
-    uint64_t count = CHAR_BIT * sizeof num - 2;
-    uint64_t reverse_num = num;
-    for (num >>= 2; num; reverse_num <<= 2, reverse_num |= num & 3, num >>= 2, count -= 2);
-    return reverse_num << count;
+    num = ((num >> 2) & 0x3333333333333333ULL) | ((num & 0x3333333333333333ULL) << 2);
+    num = ((num >> 4) & 0x0F0F0F0F0F0F0F0FULL) | ((num & 0x0F0F0F0F0F0F0F0FULL) << 4);
+    num = ((num >> 8) & 0x00FF00FF00FF00FFULL) | ((num & 0x00FF00FF00FF00FFULL) << 8);
+    num = ((num >> 16) & 0x0000FFFF0000FFFFULL) | ((num & 0x0000FFFF0000FFFFULL) << 16);
+    return (num >> 32) | (num << 32);
 }
 
 uint32_t _reversePairs(uint32_t num) {
     /*
-     * Reverse bit 13-mer helper.
+     * Reverse bit 13-mer helper: swap 2-bit pairs, nibbles, bytes and halves.
      */
-    uint32_t count = CHAR_BIT * sizeof num - 2;
-    uint32_t reverse_num = num;
-    for (num >>= 2; num; reverse_num <<= 2, reverse_num |= num & 3, num >>= 2, count -= 2);
-    return reverse_num << count;
+    num = ((num >> 2) & 0x33333333U) | ((num & 0x33333333U) << 2);
+    num = ((num >> 4) & 0x0F0F0F0FU) | ((num & 0x0F0F0F0FU) << 4);
+    num = ((num >> 8) & 0x00FF00FFU) | ((num & 0x00FF00FFU) << 8);
+    return (num >> 16) | (num << 16);
 }
 
 
@@ -17,8 +17,20 @@ enum {
     BASE_C = 0x1, /*'binary: 01 */
     BASE_G = 0x2, /* binary: 10 */
     BASE_T = 0x3, /* binary: 11 */
+    BASE_INVALID = 0x4, /* binary: 100, not a nucleotide */
 };
 
+struct NucleotideCodes {
+    /*
+     * 2-bit codes for ASCII nucleotides, other symbols are coded as BASE_INVALID.
+     */
+    uint8_t code[256];
+
+    NucleotideCodes();
+};
+
+extern const NucleotideCodes nucleotide_codes;
+
 void get_bitset_dna23(uint64_t x, std::string &res, int k=23);
 void get_bitset_dna23_c(uint64_t x, char *res, int k);
 std::string get_bitset_dna23(uint64_t x);
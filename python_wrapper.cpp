@@ -6,6 +6,9 @@
 #include "emphf/common.hpp"
 #include <algorithm>
 #include <sys/mman.h>
+#include <sys/stat.h>
+#include <fcntl.h>
+#include <unistd.h>
 
 
 emphf::stl_string_adaptor str_adapter;
@@ -27,12 +30,35 @@ class AindexWrapper{
     size_t n = 0;
     uint32_t max_tf = 0;
     size_t indices_length = 0;
+    size_t positions_length = 0;
+
+    void* map_file(std::string const &file_name, size_t &length, int advice) {
+        // Memory map file with private pages and set the expected access pattern
+        int fd = open(file_name.c_str(), O_RDONLY);
+        if (fd == -1) {
+            std::cerr << "Failed to open: " << file_name << std::endl;
+            exit(10);
+        }
+        struct stat sb;
+        if (fstat(fd, &sb) == -1) {
+            std::cerr << "Failed to stat: " << file_name << std::endl;
+            exit(10);
+        }
+        length = sb.st_size;
+        void* data = mmap(NULL, length, PROT_READ|PROT_WRITE, MAP_PRIVATE, fd, 0);
+        close(fd);
+        if (data == MAP_FAILED) {
+            std::cerr << "Failed to mmap: " << file_name << std::endl;
+            exit(10);
+        }
+        madvise(data, length, advice);
+        return data;
+    }
 
 public:
 
     PHASH_MAP *hash_map;
     size_t n_reads = 0;
-    std::map<size_t, uint32_t> start2rid;
     std::vector<size_t> start_positions;
 
     size_t *start_postitions_raw = nullptr;
@@ -46,7 +72,7 @@ public:
 
     ~AindexWrapper() {
         emphf::logger() << "NOTE: Calling aindex deconstructor..." << std::endl;
-        if (positions != nullptr) munmap(positions, n*sizeof(size_t));
+        if (positions != nullptr) munmap(positions, positions_length);
         if (indices != nullptr) munmap(indices, indices_length);
         if (reads != nullptr) munmap(reads, reads_length);
 
@@ -82,18 +108,8 @@ public:
     void load_reads(std::string reads_file) {
         // Memory map reads
         emphf::logger() << "Memory mapping reads file..." << std::endl;
-        std::ifstream fout(reads_file, std::ios::in | std::ios::binary);
-        fout.seekg(0, std::ios::end);
-        size_t length = fout.tellg();
-        fout.close();
-
-        FILE* in = std::fopen(reads_file.c_str(), "rb");
-        reads = (char*)mmap(NULL, length, PROT_READ|PROT_WRITE, MAP_PRIVATE, fileno(in), 0);
-        if (reads == nullptr) {
-            std::cerr << "Failed position loading" << std::endl;
-            exit(10);
-        }
-        fclose(in);
+        size_t length = 0;
+        reads = (char*)map_file(reads_file, length, MADV_SEQUENTIAL);
 
         n_reads = 0;
         reads_length = length;
@@ -114,6 +130,8 @@ public:
                 rid += 1;
             }
         }
+        // after the scans above reads are accessed by kmer hits
+        madvise(reads, length, MADV_RANDOM);
         emphf::logger() << "\tDone" << std::endl;
 
     }
@@ -151,37 +169,12 @@ public:
 
         emphf::logger() << "Reading aindex.indices.bin array..." << std::endl;
 
-        size_t pos = 0;
-        std::ifstream fout5(indices_file, std::ios::in | std::ios::binary);
-        fout5.seekg(0, std::ios::end);
-        size_t length = fout5.tellg();
-        fout5.close();
-
-        FILE* in1 = std::fopen(indices_file.c_str(), "rb");
-        indices = (size_t*)mmap(NULL, length, PROT_READ|PROT_WRITE, MAP_PRIVATE, fileno(in1), 0);
-        if (indices == nullptr) {
-            std::cerr << "Failed position loading" << std::endl;
-            exit(10);
-        }
-        fclose(in1);
-        indices_length = length;
+        indices = (size_t*)map_file(indices_file, indices_length, MADV_RANDOM);
         emphf::logger() << "\tDone" << std::endl;
 
         emphf::logger() << "Reading aindex.index.bin array..." << std::endl;
 
-        pos = 0;
-        std::ifstream fout6(index_file, std::ios::in | std::ios::binary);
-        fout6.seekg(0, std::ios::end);
-        length = fout6.tellg();
-        fout6.close();
-
-        FILE* in = std::fopen(index_file.c_str(), "rb");
-        positions = (size_t*)mmap(NULL, length, PROT_READ|PROT_WRITE, MAP_PRIVATE, fileno(in), 0);
-        if (positions == nullptr) {
-            std::cerr << "Failed position loading" << std::endl;
-            exit(10);
-        }
-        fclose(in);
+        positions = (size_t*)map_file(index_file, positions_length, MADV_RANDOM);
         emphf::logger() << "\tDone" << std::endl;
 
     }
@@ -231,6 +224,13 @@ public:
         }
     }
 
+    void get_rids(size_t* poses, size_t* r, size_t n) {
+        // Save rids for n given positions to r.
+        for (size_t i=0; i < n; ++i) {
+            r[i] = get_rid(poses[i]);
+        }
+    }
+
     size_t get_kid_by_kmer(std::string _kmer) {
         uint64_t kmer = get_dna23_bitset(_kmer);
         return hash_map->get_pfid_by_umer_safe(kmer);
@@ -239,18 +239,19 @@ public:
 
     
 
-    void get_positions(size_t* r, std::string kmer) {
-        // Get read positions and save them to given r
+    size_t get_positions(size_t* r, std::string kmer) {
+        // Get read positions, save them to given r and return their number
         auto h1 = hash_map->get_pfid(kmer);
         size_t j = 0;
         for (size_t i=indices[h1]; i < indices[h1+1]; ++i) {
-            if (j == max_tf - 1) {
+            if (j == max_tf - 1 || positions[i] == 0) {
                 break;
             }
             r[j] = positions[i];
             j += 1;
         }
         r[j] = 0;
+        return j;
     }
 
     size_t get(char* ckmer) {
@@ -262,23 +263,75 @@ public:
     size_t get(std::string kmer) {
         // Return tf for given kmer
         uint64_t ukmer = get_dna23_bitset(kmer);
-        auto h1 = hash_map->hasher.lookup(kmer, str_adapter);
-        if (h1 >= hash_map->n || hash_map->checker[h1] != ukmer) {
-            std::string rev_kmer = "NNNNNNNNNNNNNNNNNNNNNNN";
-            uint64_t urev_kmer = reverseDNA(ukmer);
-            get_bitset_dna23(urev_kmer, rev_kmer);
-            auto h2 = hash_map->hasher.lookup(rev_kmer, str_adapter);
-            if (h2 >= hash_map->n || hash_map->checker[h2] != urev_kmer) {
-                return 0;
-            } else {
-                return hash_map->tf_values[h2];
+        std::string rev_kmer = "NNNNNNNNNNNNNNNNNNNNNNN";
+        return get(kmer, ukmer, rev_kmer);
+    }
+
+    size_t get(std::string &kmer, uint64_t ukmer, std::string &rev_kmer) {
+        // Return tf for given kmer and its 2-bit code, rev_kmer is reused as a buffer.
+        // Kmers are stored in canonical form (see get_pfid), so only the canonical one is looked up.
+        uint64_t urev_kmer = reverseDNA(ukmer);
+        if (ukmer <= urev_kmer) {
+            auto h1 = hash_map->hasher.lookup(kmer, str_adapter);
+            if (h1 < hash_map->n && hash_map->checker[h1] == ukmer) {
+                return hash_map->tf_values[h1];
             }
-        } else {
-            return hash_map->tf_values[h1];
+            return 0;
+        }
+        get_bitset_dna23(urev_kmer, rev_kmer);
+        auto h2 = hash_map->hasher.lookup(rev_kmer, str_adapter);
+        if (h2 < hash_map->n && hash_map->checker[h2] == urev_kmer) {
+            return hash_map->tf_values[h2];
         }
         return 0;
     }
 
+    size_t get_tf_by_code(uint64_t ukmer) {
+        // Return tf for given 2-bit encoded kmer
+        return hash_map->get_freq(ukmer);
+    }
+
+    void get_tf_values(char* kmers, size_t n, size_t* r) {
+        // Save tf for n kmers concatenated in given string to r
+        std::string kmer(Settings::K, 'N');
+        std::string rev_kmer(Settings::K, 'N');
+        for (size_t i=0; i < n; ++i) {
+            char* ckmer = &kmers[i * Settings::K];
+            kmer.assign(ckmer, Settings::K);
+            r[i] = get(kmer, get_dna23_bitset(ckmer), rev_kmer);
+        }
+    }
+
+    size_t get_tf_values_for_sequence(char* sequence, size_t length, size_t* r) {
+        // Save tf for every kmer of given sequence of given length to r and return the number of kmers.
+        // The kmer code is rolled one nucleotide at a time, kmers with non ACGT symbols get zero tf.
+        if (length < Settings::K) {
+            return 0;
+        }
+        uint64_t mask = (1ULL << (2*Settings::K)) - 1;
+        uint64_t ukmer = 0;
+        size_t valid = 0;
+        std::string kmer(Settings::K, 'N');
+        std::string rev_kmer(Settings::K, 'N');
+        for (size_t i=0; i < length; ++i) {
+            uint8_t base = nucleotide_codes.code[(uint8_t)sequence[i]];
+            if (base == BASE_INVALID) {
+                valid = 0;
+            } else {
+                valid += 1;
+            }
+            ukmer = ((ukmer << 2) | (base & BASE_MASK)) & mask;
+            if (i + 1 >= Settings::K) {
+                if (valid >= Settings::K) {
+                    kmer.assign(&sequence[i + 1 - Settings::K], Settings::K);
+                    r[i + 1 - Settings::K] = get(kmer, ukmer, rev_kmer);
+                } else {
+                    r[i + 1 - Settings::K] = 0;
+                }
+            }
+        }
+        return length - Settings::K + 1;
+    }
 
     void get_kmer_by_kid(size_t r, char* kmer) {
             // if (r >= hash_map->n) {
@@ -367,7 +420,8 @@ public:
 
     void check_aindex_reads() {
 
-        bool* used_reads = new bool[1];
+        // two flags per read for left and right subreads, last read may lack newline
+        bool* used_reads = new bool[2*(n_reads+1)]();
         std::vector<Hit> hits;
 
         for (size_t h1=0; h1<hash_map->n; ++h1) {
@@ -390,6 +444,7 @@ public:
                 std::cout << kmer << " " << subkmer << " " << h1 << " " << hash_map->tf_values[h1] << std::endl;
             }
         }
+        delete[] used_reads;
     }
 
 
@@ -431,7 +486,8 @@ public:
                 end += 1;
             }
 
-            size_t real_rid = start2rid[start];
+            // read rid ends with rid-th newline
+            size_t real_rid = std::lower_bound(start_postitions_raw, start_postitions_raw + n_reads, start) - start_postitions_raw;
 
             Hit hit;
             hit.rid = real_rid;
@@ -515,6 +571,15 @@ public:
 
 extern "C" {
 
+    size_t AindexWrapper_hamming_distance(char* s1, char* s2, size_t n) {
+        // Count differing symbols in first n positions, positions with N are skipped
+        size_t d = 0;
+        for (size_t i=0; i < n; ++i) {
+            d += (s1[i] != s2[i]) & (s1[i] != 'N') & (s2[i] != 'N');
+        }
+        return d;
+    }
+
     AindexWrapper* AindexWrapper_new(){ return new AindexWrapper(); }
     void AindexWrapper_load(AindexWrapper* foo, char* index_prefix){ foo->load(index_prefix); }
 
@@ -537,13 +602,21 @@ extern "C" {
 
     size_t AindexWrapper_get(AindexWrapper* foo, char* kmer){ return foo->get(kmer); }
 
+    size_t AindexWrapper_get_tf_by_code(AindexWrapper* foo, uint64_t ukmer){ return foo->get_tf_by_code(ukmer); }
+
+    void AindexWrapper_get_tf_values(AindexWrapper* foo, char* kmers, size_t n, size_t* r){ foo->get_tf_values(kmers, n, r); }
+
+    size_t AindexWrapper_get_tf_values_for_sequence(AindexWrapper* foo, char* sequence, size_t length, size_t* r){ return foo->get_tf_values_for_sequence(sequence, length, r); }
+
     size_t AindexWrapper_get_n(AindexWrapper* foo){ return foo->get_n(); }
 
     size_t AindexWrapper_get_rid(AindexWrapper* foo, size_t pos){ return foo->get_rid(pos); }
 
+    void AindexWrapper_get_rids(AindexWrapper* foo, size_t* poses, size_t* r, size_t n){ foo->get_rids(poses, r, n); }
+
 //    char* AindexWrapper_get_read(AindexWrapper* foo, size_t start, int ori){ return foo->get_read(pos, ori); }
 
-    void AindexWrapper_get_positions(AindexWrapper* foo, size_t* r, char* kmer){ foo->get_positions(r, kmer); }
+    size_t AindexWrapper_get_positions(AindexWrapper* foo, size_t* r, char* kmer){ return foo->get_positions(r, kmer); }
 
     void AindexWrapper_set_positions(AindexWrapper* foo, size_t* r, char* kmer){ foo->set_positions(r, kmer); }
 
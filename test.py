@@ -17,14 +17,15 @@ if __name__ == "__main__":
 
     kmer2tf = aindex.load_aindex(settings, skip_aindex=False, skip_reads=False)
 
-    time.sleep(10)
-
     print("P1DONE")
 
     s = "TAAGTTATTATTTAGTTAATACTTTTAACAATATTATTAAGGTATTTAAAAAATACTATTATAGTATTTAACATAGTTAAATACCTTCCTTAATACTGTTA"
     print(s)
-    for i in range(len(s)-23+1):
-        kmer = s[i:i+23]
-        print(i, kmer, kmer2tf[kmer])
+    kmers = [s[i:i+23] for i in range(len(s)-23+1)]
+    start = time.time()
+    tfs = kmer2tf.get_tf_values(kmers)
+    print("Lookups done in %.4f sec" % (time.time() - start))
+    for i, kmer in enumerate(kmers):
+        print(i, kmer, tfs[i])
 
 
@@ -26,30 +26,21 @@ if __name__ == '__main__':
     results = []
     for seq_obj in sc_iter_fasta(settings["gene_fasta"]):
 
-        for i in xrange(seq_obj.length-k+1):
-            kmer = seq_obj.sequence[i:i+k]
-            tf = index[kmer]
+        tfs = index.get_tf_values_for_sequence(seq_obj.sequence, k=k)
+        for i, tf in enumerate(tfs):
             if not tf:
                 continue
+            kmer = seq_obj.sequence[i:i+k]
 
             print i, kmer, tf
 
-            hits = []
             for data in get_reads_se_by_kmer(kmer, index, used_reads):
                 start, next_read_start, subread, pos, spring_pos, was_reversed, poses_in_read = data
                 used_reads.add((start, spring_pos))
-                hits.append([pos, 0, subread, poses_in_read, was_reversed])
-            if not hits:
-                continue
-            max_pos = max([x[0] for x in hits])
-            for hid, (pos, nnn, subread, poses_in_read, was_reversed) in enumerate(hits):
                 if i-pos < 0:
-                    hits[hid][1] = 0
-                    hits[hid][2] = subread[abs(i-pos):]
+                    results.append([pos, 0, subread[pos-i:], poses_in_read, was_reversed])
                 else:
-                    hits[hid][1] = i-pos
-
-                results.append(hits[hid])
+                    results.append([pos, i-pos, subread, poses_in_read, was_reversed])
     results.sort(key=lambda x: x[1]) 
 
     for i, (pos, nnn, subread, poses_in_read, was_reversed) in enumerate(results):
@@ -62,15 +53,15 @@ if __name__ == '__main__':
         print i, set(nucleotides), variants, seq_obj.sequence[i]
 
         if len(variants) > 1 or (len(variants) == 1 and variants[0][0] != seq_obj.sequence[i]):
-            raw_input("?")
+            if sys.stdin.isatty():
+                raw_input("?")
 
 
 
     with open("/home/akomissarov/Dropbox/PySatDNA/temp.layout", "w") as fh:
-        fh.write(seq_obj.sequence)
-        fh.write("\n")
-        for pos, nnn, subread, poses_in_read, was_reversed in results:
-                fh.write("%s\n" % ("N"*nnn+subread))
+        layout = [seq_obj.sequence]
+        layout.extend(x[-1] for x in results)
+        fh.write("\n".join(layout) + "\n")
 
 
 